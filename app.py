@@ -8,9 +8,11 @@ from recommendation_engine import load_and_preprocess_data, get_recommendations
 import sys
 
 # --- Helper function to convert an image to Base64 ---
+@st.cache_data
 def get_base64_image(image_path):
     """
     Reads an image from a file path and returns its Base64-encoded string.
+    The result is cached so the image isn't re-encoded on every rerun.
     """
     try:
         with open(image_path, "rb") as image_file:
@@ -18,6 +20,16 @@ def get_base64_image(image_path):
     except FileNotFoundError:
         return None
 
+# --- Cached engine loader ---
+@st.cache_resource
+def load_engine():
+    """
+    Loads the recommendation engine once per process and shares it across sessions.
+    The engine object itself is cached, so it survives a re-import of
+    recommendation_engine after a source change.
+    """
+    return load_and_preprocess_data()
+
 # --- Main Streamlit App Code ---
 # Set up the custom CSS for the background image.
 # We are now getting the image from the same directory as the script.
@@ -63,10 +75,12 @@ st.markdown("---")
 try:
     with st.spinner("Loading and preprocessing data... This may take a moment."):
         # Assuming recommendation_engine.py is in the same directory and works correctly
-        engine_loaded = load_and_preprocess_data()
+        engine = load_engine()
     
-    if not engine_loaded:
-        st.error("Could not load the recommendation engine. Please ensure 'imdb_2024_movies.csv' exists.")
+    if engine is None:
+        # Don't keep a failed load cached; retry on the next rerun.
+        load_engine.clear()
+        st.error("Could not load the recommendation engine. Please ensure 'imdb_2024_movies.parquet' exists.")
         st.stop()
 except Exception as e:
     st.error(f"An unexpected error occurred during engine setup: {e}")
@@ -85,7 +99,7 @@ if st.button("Get Recommendations"):
         with st.spinner("Finding similar movies..."):
             try:
                 # Get the recommendations from the engine.
-                recommendations = get_recommendations(user_storyline)
+                recommendations = get_recommendations(user_storyline, engine)
             except Exception as e:
                 st.error(f"An error occurred while getting recommendations: {e}")
                 recommendations = []
@@ -2,120 +2,346 @@
 # Description: This module contains the core logic for the recommendation system,
 #              including NLP preprocessing, TF-IDF, and Cosine Similarity.
 
+import json
+import os
+from functools import lru_cache
+import hnswlib
+import joblib
+import numpy as np
 import pandas as pd
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from nltk.corpus import stopwords
-import nltk
-
-# --- Download NLTK data (if not already downloaded) ---
-# This is a one-time download needed for stopwords.
-try:
-    nltk.data.find('corpora/stopwords')
-except nltk.downloader.DownloadError:
-    nltk.download('stopwords')
+from scipy.sparse import diags, load_npz, save_npz
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 
 # --- Global Variables ---
-DATA_FILE = "imdb_2024_movies.csv"
+DATA_FILE = "imdb_2024_movies.parquet"
 RECOMMENDATION_COUNT = 5
-movies_df = None
-tfidf_vectorizer = None
-tfidf_matrix = None
+QUERY_CACHE_SIZE = 1024
+# Storylines this short are placeholders such as "N/A" rather than real plots.
+MIN_STORYLINE_LENGTH = 20
+
+# Vocabulary bounds, as in TfidfVectorizer's min_df/max_df/max_features.
+# Only applied to large catalogs: in a few dozen storylines nearly every
+# distinctive word appears once, and those are the words queries match on.
+VOCAB_PRUNE_MIN_MOVIES = 1000
+MIN_DF = 2
+MAX_DF = 0.9
+MAX_FEATURES = 20000
+
+# Artifacts written after the first fit so later startups can skip preprocessing.
+MOVIES_CACHE_FILE = "movies.parquet"
+TFIDF_MATRIX_FILE = "tfidf_matrix.npz"
+TFIDF_TRANSFORMER_FILE = "tfidf_transformer.joblib"
+# Records the preprocessing settings the artifacts were built with.
+CACHE_PARAMS_FILE = "tfidf_params.json"
+CACHE_FILES = (MOVIES_CACHE_FILE, TFIDF_MATRIX_FILE, TFIDF_TRANSFORMER_FILE, CACHE_PARAMS_FILE)
+
+# Approximate nearest-neighbour (HNSW) search over LSA-reduced vectors.
+# Only used for large catalogs; below this size the exact sparse product is
+# already fast, and it doesn't lose any recall.
+ANN_MIN_MOVIES = 10000
+ANN_DIMENSIONS = 128
+ANN_EF_CONSTRUCTION = 200
+ANN_M = 16
+ANN_QUERY_EF = 50
+LSA_SVD_FILE = "lsa_svd.joblib"
+ANN_INDEX_FILE = "hnsw_index.bin"
+# Records the settings the SVD and HNSW index were built with.
+ANN_PARAMS_FILE = "hnsw_params.json"
+
+# Tokens are hashed straight to column indices, so there is no vocabulary to
+# fit or store. Lowercasing, punctuation stripping and stopword removal all
+# happen inside the tokenizer, so no per-row cleaning is needed.
+hashing_vectorizer = HashingVectorizer(
+    n_features=2**18,
+    alternate_sign=False,
+    norm=None,
+    stop_words='english',
+    lowercase=True,
+    token_pattern=r'(?u)\b[a-z0-9]+\b',
+    # Emit float32 counts so the L2-normalized TF-IDF rows built from them are
+    # float32 too, halving the memory traffic of the similarity product.
+    # float32 precision doesn't change the top-k order.
+    dtype=np.float32
+)
+
+# --- Cached Artifacts ---
+def _preprocessing_params():
+    """
+    Returns the settings that determine the cached artifacts, serialized as JSON.
+    """
+    params = {
+        'min_storyline_length': MIN_STORYLINE_LENGTH,
+        'vocab_prune_min_movies': VOCAB_PRUNE_MIN_MOVIES,
+        'min_df': MIN_DF,
+        'max_df': MAX_DF,
+        'max_features': MAX_FEATURES,
+        'hashing_vectorizer': hashing_vectorizer.get_params(),
+    }
+    return json.dumps(params, sort_keys=True, default=str)
+
+def _cache_is_fresh():
+    """
+    Returns True if all cached artifacts exist, were built with the current
+    preprocessing settings, and are newer than the data file.
+    """
+    if not all(os.path.exists(path) for path in CACHE_FILES):
+        return False
+    with open(CACHE_PARAMS_FILE) as params_file:
+        if params_file.read() != _preprocessing_params():
+            return False
+    if not os.path.exists(DATA_FILE):
+        return True
+    data_mtime = os.path.getmtime(DATA_FILE)
+    return all(os.path.getmtime(path) >= data_mtime for path in CACHE_FILES)
+
+# --- Vocabulary Pruning ---
+def _vocabulary_mask(term_counts):
+    """
+    Returns a boolean mask over the hashed columns that keeps terms appearing in
+    at least MIN_DF and at most MAX_DF of the storylines, limited to the
+    MAX_FEATURES most frequent ones.
+    """
+    n_docs = term_counts.shape[0]
+    doc_freq = np.bincount(term_counts.indices, minlength=term_counts.shape[1])
+    keep = (doc_freq >= MIN_DF) & (doc_freq <= MAX_DF * n_docs)
+    if keep.sum() > MAX_FEATURES:
+        term_freq = np.asarray(term_counts.sum(axis=0)).ravel()
+        term_freq[~keep] = -1
+        keep = np.zeros_like(keep)
+        keep[np.argpartition(term_freq, -MAX_FEATURES)[-MAX_FEATURES:]] = True
+    return keep
+
+def _prune_vocabulary(term_counts):
+    """
+    Zeroes the columns outside the vocabulary bounds. A storyline that would be
+    left with no terms at all keeps its original counts instead.
+    """
+    pruned = term_counts @ diags(_vocabulary_mask(term_counts).astype(np.float32))
+    pruned.eliminate_zeros()
+    emptied = (np.diff(pruned.indptr) == 0) & (np.diff(term_counts.indptr) > 0)
+    if emptied.any():
+        pruned = pruned + diags(emptied.astype(np.float32)) @ term_counts
+    return pruned.tocsr()
+
+# --- Approximate Nearest-Neighbour Index ---
+def _ann_params():
+    """
+    Returns the settings that determine the saved SVD and HNSW index, serialized as JSON.
+    """
+    params = {
+        'dimensions': ANN_DIMENSIONS,
+        'ef_construction': ANN_EF_CONSTRUCTION,
+        'M': ANN_M,
+    }
+    return json.dumps(params, sort_keys=True)
+
+def _ann_cache_is_fresh():
+    """
+    Returns True if the saved SVD and HNSW index exist, were built with the
+    current settings, and are newer than the matrix artifact.
+    """
+    ann_files = (LSA_SVD_FILE, ANN_INDEX_FILE, ANN_PARAMS_FILE)
+    if not all(os.path.exists(path) for path in ann_files):
+        return False
+    with open(ANN_PARAMS_FILE) as params_file:
+        if params_file.read() != _ann_params():
+            return False
+    matrix_mtime = os.path.getmtime(TFIDF_MATRIX_FILE)
+    return all(os.path.getmtime(path) >= matrix_mtime for path in ann_files)
+
+def _load_or_build_ann_index(matrix):
+    """
+    Returns an (svd, index) pair for HNSW search over the TF-IDF matrix, loading
+    saved copies when they are still up to date.
+    """
+    if _ann_cache_is_fresh():
+        svd = joblib.load(LSA_SVD_FILE)
+        index = hnswlib.Index(space='cosine', dim=svd.n_components)
+        index.load_index(ANN_INDEX_FILE, max_elements=matrix.shape[0])
+    else:
+        # Reduce the sparse TF-IDF rows to dense LSA vectors for HNSW.
+        svd = TruncatedSVD(n_components=min(ANN_DIMENSIONS, matrix.shape[1] - 1))
+        vectors = svd.fit_transform(matrix).astype(np.float32)
+        index = hnswlib.Index(space='cosine', dim=svd.n_components)
+        index.init_index(max_elements=matrix.shape[0], ef_construction=ANN_EF_CONSTRUCTION, M=ANN_M)
+        index.add_items(vectors)
+        joblib.dump(svd, LSA_SVD_FILE)
+        index.save_index(ANN_INDEX_FILE)
+        # Written last, so an interrupted save is treated as stale.
+        with open(ANN_PARAMS_FILE, 'w') as params_file:
+            params_file.write(_ann_params())
+    index.set_ef(max(ANN_QUERY_EF, RECOMMENDATION_COUNT))
+    print("HNSW index ready.")
+    return svd, index
+
+# --- Recommendation Engine ---
+class RecommendationEngine:
+    """
+    Holds the movie data, TF-IDF weights and optional HNSW index for one loaded
+    dataset, and answers storyline queries against them.
+    """
+    def __init__(self, movies_df, tfidf_transformer, tfidf_matrix, lsa_svd=None, ann_index=None):
+        # Keep names and storylines as plain arrays so queries can index them
+        # directly without building a DataFrame slice.
+        self.movie_names = movies_df['Movie Name'].to_numpy()
+        self.movie_storylines = movies_df['Storyline'].to_numpy()
+        self.tfidf_transformer = tfidf_transformer
+        
+        # Store the transpose once, laid out for the `user_vector @ tfidf_matrix_T`
+        # product, so queries don't re-transpose the matrix every time.
+        self.tfidf_matrix_T = tfidf_matrix.T.tocsr()
+        self.lsa_svd = lsa_svd
+        self.ann_index = ann_index
+        
+        # Repeated storylines are answered from a cache keyed on the normalized
+        # text; it belongs to this engine, so reloading the data starts fresh.
+        self.top_k_for = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._top_k_for)
+
+    def _top_k_for(self, normalized_storyline):
+        """
+        Returns the row indices of the most similar movies, best match first.
+        """
+        # --- Vectorize User Input ---
+        # Convert the user's storyline into a TF-IDF vector, using the same hashing
+        # and IDF weights as the movie storylines.
+        user_vector = self.tfidf_transformer.transform(hashing_vectorizer.transform([normalized_storyline]))
+
+        k = min(RECOMMENDATION_COUNT, self.tfidf_matrix_T.shape[1])
+
+        if self.ann_index is not None:
+            # --- Approximate Search ---
+            # Project the query into the same LSA space and ask HNSW for its neighbours.
+            user_lsa = self.lsa_svd.transform(user_vector).astype(np.float32)
+            labels, _ = self.ann_index.knn_query(user_lsa, k=k)
+            top_indices = labels[0]
+        else:
+            # --- Calculate Cosine Similarity ---
+            # TfidfTransformer L2-normalizes every row (norm='l2' by default), so the
+            # cosine similarity reduces to a plain dot product with each movie vector.
+            scores = (user_vector @ self.tfidf_matrix_T).toarray().ravel()
+
+            # --- Get Top Recommendations ---
+            # `argpartition()` moves the k highest scores to the end in linear time;
+            # only those k entries are then sorted, highest score first.
+            top_candidates = np.argpartition(scores, -k)[-k:]
+            top_indices = top_candidates[np.argsort(scores[top_candidates])[::-1]]
+
+        # A tuple is hashable and immutable, so it is safe to keep in the cache.
+        return tuple(int(i) for i in top_indices)
 
 # --- Data Loading and Preprocessing ---
 def load_and_preprocess_data():
     """
-    Loads movie data from a CSV, cleans the storylines, and creates the TF-IDF matrix.
+    Loads movie data from a Parquet file, cleans the storylines, and creates the TF-IDF matrix.
+    If previously saved artifacts are up to date, they are loaded instead.
+    Returns a RecommendationEngine, or None if the data could not be loaded.
     """
-    global movies_df, tfidf_vectorizer, tfidf_matrix
-    
     try:
-        movies_df = pd.read_csv(DATA_FILE)
+        if _cache_is_fresh():
+            movies_df = pd.read_parquet(MOVIES_CACHE_FILE)
+            tfidf_transformer = joblib.load(TFIDF_TRANSFORMER_FILE)
+            tfidf_matrix = load_npz(TFIDF_MATRIX_FILE).astype(np.float32, copy=False)
+            print("Loaded cached TF-IDF matrix.")
+            print(f"Number of movies to analyze: {len(movies_df)}")
+        else:
+            # Read only the columns the engine uses.
+            movies_df = pd.read_parquet(DATA_FILE, columns=['Movie Name', 'Storyline'])
+        
+            # Drop rows with missing values in the 'Storyline' column.
+            movies_df.dropna(subset=['Storyline'], inplace=True)
         
-        # Drop rows with missing values in the 'Storyline' column.
-        movies_df.dropna(subset=['Storyline'], inplace=True)
+            # Drop duplicate and placeholder storylines; they add matrix rows
+            # and fill the top results with near-identical entries.
+            movies_df = movies_df.drop_duplicates(subset=['Storyline'])
+            movies_df = movies_df[movies_df['Storyline'].str.len() > MIN_STORYLINE_LENGTH]
         
-        print("Data loaded and preprocessed.")
-        print(f"Number of movies to analyze: {len(movies_df)}")
+            if movies_df.empty:
+                print(f"Error: no usable storylines found in '{DATA_FILE}'.")
+                print("Every storyline was missing, duplicated or a placeholder. Please re-run scraper.py.")
+                return None
         
-        # --- Text Cleaning ---
-        # A simple function to clean the text.
-        def clean_text(text):
-            # Convert to lowercase.
-            text = text.lower()
-            # Remove special characters and punctuation.
-            text = re.sub(r'[^a-z0-9\s]', '', text)
-            # Remove stopwords.
-            text = ' '.join([word for word in text.split() if word not in stopwords.words('english')])
-            return text
-            
-        # Apply the cleaning function to the 'Storyline' column.
-        movies_df['Cleaned Storyline'] = movies_df['Storyline'].apply(clean_text)
+            print("Data loaded and preprocessed.")
+            print(f"Number of movies to analyze: {len(movies_df)}")
         
-        # --- TF-IDF Vectorization ---
-        # Create a TF-IDF Vectorizer instance.
-        # This converts text documents into a matrix of TF-IDF features.
-        tfidf_vectorizer = TfidfVectorizer(stop_words='english')
+            # --- TF-IDF Vectorization ---
+            # Hash the storylines into term counts, then weight them by IDF.
+            # Only the small IDF transformer needs to be fitted and stored.
+            term_counts = hashing_vectorizer.transform(movies_df['Storyline'].fillna(''))
         
-        # Fit and transform the cleaned storylines to create the TF-IDF matrix.
-        tfidf_matrix = tfidf_vectorizer.fit_transform(movies_df['Cleaned Storyline'])
+            # Drop rare and overly common terms from the movie rows of large
+            # catalogs. Queries don't need the same mask: a term no movie has
+            # only rescales every score of that query by the same factor, so
+            # the ranking is unchanged.
+            if term_counts.shape[0] >= VOCAB_PRUNE_MIN_MOVIES:
+                term_counts = _prune_vocabulary(term_counts)
+            tfidf_transformer = TfidfTransformer(sublinear_tf=True)
         
-        print("TF-IDF matrix created.")
+            # Fit and transform the term counts to create the TF-IDF matrix.
+            tfidf_matrix = tfidf_transformer.fit_transform(term_counts)
+        
+            print("TF-IDF matrix created.")
+        
+            # --- Save Artifacts ---
+            # Keep only the columns needed at query time, aligned with the matrix rows.
+            movies_df = movies_df[['Movie Name', 'Storyline']].reset_index(drop=True)
+            movies_df.to_parquet(MOVIES_CACHE_FILE)
+            joblib.dump(tfidf_transformer, TFIDF_TRANSFORMER_FILE)
+            save_npz(TFIDF_MATRIX_FILE, tfidf_matrix)
+            # Written last, so an interrupted save is treated as stale.
+            with open(CACHE_PARAMS_FILE, 'w') as params_file:
+                params_file.write(_preprocessing_params())
+        
+        # Large catalogs switch to approximate search.
+        if tfidf_matrix.shape[0] >= ANN_MIN_MOVIES:
+            lsa_svd, ann_index = _load_or_build_ann_index(tfidf_matrix)
+        else:
+            lsa_svd, ann_index = None, None
+        
+        return RecommendationEngine(movies_df, tfidf_transformer, tfidf_matrix, lsa_svd, ann_index)
         
     except FileNotFoundError:
         print(f"Error: The file '{DATA_FILE}' was not found.")
         print("Please run scraper.py first to generate the dataset.")
-        return False
+        return None
     except Exception as e:
         print(f"An error occurred during data loading and preprocessing: {e}")
-        return False
-        
-    return True
+        return None
 
 # --- Recommendation Logic ---
-def get_recommendations(user_storyline):
+def _normalize_storyline(user_storyline):
+    """
+    Normalizes case and whitespace so equivalent queries share a cache entry.
+    The vectorizer lowercases and tokenizes on word boundaries anyway, so this
+    doesn't change the resulting vector.
+    """
+    return ' '.join(user_storyline.lower().split())
+
+def get_recommendations(user_storyline, engine):
     """
-    Takes a user's storyline, finds the most similar movies, and returns the top 5.
+    Takes a user's storyline, finds the most similar movies in the given engine,
+    and returns the top 5. Repeated storylines are answered from the engine's cache.
     """
-    if movies_df is None or tfidf_vectorizer is None or tfidf_matrix is None:
+    if engine is None:
         print("Recommendation engine is not initialized. Please call load_and_preprocess_data() first.")
         return []
 
-    # --- Preprocess User Input ---
-    # The user's storyline must be preprocessed in the same way as the movie storylines.
-    user_storyline = user_storyline.lower()
-    user_storyline = re.sub(r'[^a-z0-9\s]', '', user_storyline)
-    user_storyline = ' '.join([word for word in user_storyline.split() if word not in stopwords.words('english')])
-    
-    # --- Vectorize User Input ---
-    # Convert the user's storyline into a TF-IDF vector.
-    user_vector = tfidf_vectorizer.transform([user_storyline])
-
-    # --- Calculate Cosine Similarity ---
-    # Calculate the similarity between the user's input vector and all movie vectors.
-    cosine_sim = cosine_similarity(user_vector, tfidf_matrix)
-
-    # --- Get Top Recommendations ---
-    # Get the indices of the movies with the highest similarity scores.
-    # The `argsort()` function returns the indices that would sort the array.
-    # We take the last few indices to get the highest scores.
-    similarity_scores = list(enumerate(cosine_sim[0]))
-    similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
-    
-    # Select the top N movies (excluding the user's input movie if it were in the dataset).
-    top_indices = [i[0] for i in similarity_scores[0:RECOMMENDATION_COUNT]]
+    top_indices = engine.top_k_for(_normalize_storyline(user_storyline))
     
     # Return the details of the recommended movies.
-    recommended_movies = movies_df.iloc[top_indices][['Movie Name', 'Storyline']].to_dict('records')
+    recommended_movies = [
+        {'Movie Name': engine.movie_names[i], 'Storyline': engine.movie_storylines[i]}
+        for i in top_indices
+    ]
     
     return recommended_movies
 
 # --- Test the module (optional) ---
 if __name__ == "__main__":
-    if load_and_preprocess_data():
+    engine = load_and_preprocess_data()
+    if engine is not None:
         sample_storyline = "A young wizard begins his journey at a magical school where he makes friends and enemies, facing dark forces along the way."
-        recommendations = get_recommendations(sample_storyline)
+        recommendations = get_recommendations(sample_storyline, engine)
         
         print("\n--- Sample Recommendations ---")
         if recommendations: